@@ -1,12 +1,21 @@
+import hashlib
 import os
 import warnings
-from pathlib import Path
-from typing import Literal
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from operator import itemgetter
+from typing import Literal, Sequence
 
+import graphviz as gv
 import networkx as nx
 
-from dependentspy.module import Module, ProjectModule, complete_module_tree
-from dependentspy.utils import PathLike, find_dead_ends
+from dependentspy.module import (
+    Module,
+    ProjectModule,
+    complete_module_tree,
+    parse_import_names,
+)
+from dependentspy.utils import PathLike, find_dead_ends, iter_py_files
 from dependentspy.version import __version__
 from dependentspy.visualization import create_graphviz
 
@@ -33,6 +42,10 @@ def dependentspy(
     hide: list[str] = [],
     comment: str | None = None,
     allow_local_imports: bool = True,
+    layout_engine: str | None = None,
+    formats: Sequence[str] | None = None,
+    parallel_render: bool = False,
+    min_external_usages: int = 1,
     **kwargs,
 ):
     """Main `dependentspy` function, walking the given project directory and creating a dependency graph using graphviz.
@@ -56,6 +69,10 @@ def dependentspy(
     - ignore: A list of path patterns (similar to .gitignore) for python files to ignore.
     - hide: A list of modules to hide in the graph
     - comment: Optional comment added to the first line of the source
+    - layout_engine: Graphviz layout engine. If None, uses `"dot"`, switching to the near-linear `"sfdp"` for graphs with more than 500 nodes.
+    - formats: Optional list of output formats to render instead of the single `format` kwarg.
+    - parallel_render: Whether to run the renderer for multiple formats in parallel. Defaults to `False`.
+    - min_external_usages: Hide external modules imported from fewer files than this (requires summarize_external). Defaults to `1`.
     """
 
     # Process parameters
@@ -68,13 +85,54 @@ def dependentspy(
 
     cwd = os.getcwd()
     os.chdir(project_root)
-    paths = Path(".").rglob("*.py")
-    paths = [f for f in paths if not any(f.match(p) for p in ignore)]
+    paths = list(iter_py_files(".", ignore))
     if not paths:
         raise ValueError(
             "The given project directory does not exist or contains no .py files."
         )
 
+    # The result is deterministic in the source files and options, so cache
+    # the generated dot source keyed on file stats + options and skip the
+    # whole analysis when nothing changed since the last run.
+    options = dict(
+        name=name,
+        prune=prune,
+        render_imports=render_imports,
+        show_3rdparty=show_3rdparty,
+        show_builtin=show_builtin,
+        summarize_external=summarize_external,
+        use_clusters=use_clusters,
+        use_nested_clusters=use_nested_clusters,
+        min_cluster_size=min_cluster_size,
+        ignore=ignore,
+        hide=hide,
+        comment=comment,
+        allow_local_imports=allow_local_imports,
+        layout_engine=layout_engine,
+        min_external_usages=min_external_usages,
+        **kwargs,
+    )
+    file_stats = sorted((p, *_stat_pair(p)) for p in paths)
+    cache_key = hashlib.blake2b(
+        repr((file_stats, sorted(options.items()))).encode()
+    ).hexdigest()
+    output_dir = os.path.abspath(".") if output_to_project else cwd
+    cache_path = os.path.join(output_dir, f"{name}.cache")
+
+    cached = _read_cached_source(cache_path, cache_key)
+    if cached is not None:
+        cached_source, engine = cached
+        print("Project files and options unchanged, using cached graph.")
+        G = gv.Source(
+            cached_source,
+            filename=f"{name}.gv",
+            format=kwargs.get("format"),
+            engine=engine,
+        )
+        return _save_and_render(
+            G, cwd, output_to_project, save_dot, render, formats, parallel_render
+        )
+
     # Init module objects
     project_modules = [
         ProjectModule.from_file(p, allow_local_imports=allow_local_imports)
@@ -82,6 +140,17 @@ def dependentspy(
     ]
     project_routes = {m.route for m in project_modules}
 
+    # Parse imports of all files in parallel; ast.parse is CPU-bound and the
+    # files are independent. For small projects the process-pool overhead is
+    # not worth it, so fall back to the lazy serial path.
+    if len(project_modules) >= 64:
+        with ProcessPoolExecutor() as executor:
+            all_names = list(
+                executor.map(parse_import_names, paths, chunksize=32)
+            )
+        for module, names in zip(project_modules, all_names):
+            module.import_names = names
+
     # Complete tree structure
     project_modules: list[ProjectModule] = complete_module_tree(
         project_modules, cls=ProjectModule, allow_local_imports=allow_local_imports
@@ -90,7 +159,7 @@ def dependentspy(
 
     # Collect imported module routes and init objects
     import_routes = sorted(
-        set(sum([m.import_routes or [] for m in project_modules], []))
+        {r for m in project_modules for r in (m.import_routes or ())}
     )
     external_modules = [Module(r) for r in import_routes if r not in project_routes]
     external_modules = complete_module_tree(external_modules, cls=Module)
@@ -98,33 +167,56 @@ def dependentspy(
 
     modules = project_modules + external_modules
 
-    # Add import relations
-    route_map = {module.route: module for module in modules}
+    # Assign each module an integer id so side tables can be plain lists
+    # indexed by id instead of dicts hashing full dotted routes.
+    # Build route lookup and count module types in the same pass.
+    route_map = {}
+    type_counts = Counter()
+    for i, module in enumerate(modules):
+        module.idx = i
+        route_map[module.route] = module
+        type_counts[module.type] += 1
+
+    # Add import relations. import_routes is already materialized for every
+    # project module (the flattening pass above forced it), so this phase is
+    # pure dict lookup; itemgetter batches it into a single C-level call.
     for module in project_modules:
-        module.imports = [
-            route_map[route] for route in sorted(module.import_routes or [])
-        ]
+        routes = module.import_routes
+        if not routes:
+            module.imports = []
+        elif len(routes) == 1:
+            module.imports = [route_map[routes[0]]]
+        else:
+            module.imports = list(itemgetter(*sorted(routes))(route_map))
 
     # print("\n".join([str(m) for m in sorted(project_modules, key=str)]))
     for t in ["project", "builtin", "3rdparty"]:
-        tmodules = [m for m in modules if m.type == t]
-        print(f"Found {len(tmodules)} {t} modules")
+        print(f"Found {type_counts[t]} {t} modules")
 
     hide = []
 
-    # Init networkx import graph (just project modules)
-    gr = nx.DiGraph()
-    gr.add_nodes_from([m.route for m in project_modules if m.is_leaf()])
-    for module in project_modules:
-        for im in module.imports:
-            if im.is_project:
-                assert im.is_leaf()
-                gr.add_edge(module.route, im.route)
+    # Collect all import edges once as (src id, dst id, dst is project);
+    # reused for the NetworkX graph and for edge rendering.
+    edges = [
+        (module.idx, im.idx, im.is_project)
+        for module in project_modules
+        for im in module.imports
+    ]
 
     if prune:
+        # Init networkx import graph (just project modules); it is only
+        # needed to decide what to prune, so skip it entirely otherwise.
+        gr = nx.DiGraph()
+        gr.add_nodes_from(m.route for m in project_modules if m.is_leaf())
+        gr.add_edges_from(
+            (modules[s].route, modules[d].route)
+            for s, d, is_project in edges
+            if is_project
+        )
+
         # Hide modules that have no imports / are not imported
-        in_degrees = {module.route: gr.in_degree(module.route) for module in modules}
-        out_degrees = {module.route: gr.out_degree(module.route) for module in modules}
+        in_degrees = {n: len(p) for n, p in gr.pred.items()}
+        out_degrees = {n: len(s) for n, s in gr.succ.items()}
 
         never_imported = [
             m.route for m in project_modules if m.is_leaf() and in_degrees[m.route] == 0
@@ -145,9 +237,11 @@ def dependentspy(
     # Determine what modules to render as clusters/subgraphs
     cluster_names = {}
 
-    cluster_map: dict[str, str | None] = {
-        m.route: None for m in modules
-    }  # Maps module routes to the module route representing the containing cluster, or None.
+    cluster_map: list[str | None] = [
+        None
+    ] * len(
+        modules
+    )  # Maps module ids to the module route representing the containing cluster, or None.
 
     if use_clusters:
         for module in project_modules if summarize_external else modules:
@@ -161,19 +255,29 @@ def dependentspy(
                 continue
             cluster_names[module.route] = f"cluster[{module.route}]"
 
-        # Link each module to its containing cluster
-        for module in modules:
-            if not module.is_project and summarize_external:
-                continue
-            # Walk up the tree until module has a subgraph
-            for m in module.path_to_root:
-                if m.route in cluster_names:
-                    cluster_map[module.route] = m.route
-                    break
-
-    # Determine what modules to render as nodes
+    # Link each module to its containing cluster and determine what modules
+    # to render as nodes, in a single pass. Each cluster's parent cluster is
+    # recorded here as well: an external module can share a route with a
+    # project package (e.g. `import app` next to app/*.py files), so the
+    # parentage must come from the project-module objects, not a route lookup.
+    # `modules` is sorted by route within each sublist, so a parent is always
+    # visited before its children and its nearest cluster is already known.
     visible_modules = []
+    cluster_parents: dict[str, str | None] = {}
     for module in modules:
+        if use_clusters and (module.is_project or not summarize_external):
+            if module.route in cluster_names:
+                nearest = module.route
+                if module.route not in cluster_parents:
+                    cluster_parents[module.route] = (
+                        cluster_map[module.parent.idx] if module.parent else None
+                    )
+            elif module.parent:
+                nearest = cluster_map[module.parent.idx]
+            else:
+                nearest = None
+            cluster_map[module.idx] = nearest
+
         if not show_builtin and module.is_builtin:
             continue
         if not show_3rdparty and module.is_3rdparty:
@@ -190,20 +294,79 @@ def dependentspy(
             continue
         visible_modules.append(module)
 
+    # Pick the layout engine. dot's layered layout does not scale to large
+    # graphs, so switch to the multilevel force-directed sfdp beyond a few
+    # hundred nodes unless an engine was requested explicitly.
+    engine = layout_engine
+    if engine is None:
+        engine = "sfdp" if len(visible_modules) > 500 else "dot"
+    if engine in ("sfdp", "fdp"):
+        # Force-directed layouts place nodes freely; resolve the resulting
+        # overlaps and route the edges around the nodes.
+        graph_attr = dict(kwargs.get("graph_attr") or {})
+        graph_attr.setdefault("overlap", "prism")
+        graph_attr.setdefault("splines", "true")
+        kwargs["graph_attr"] = graph_attr
+    kwargs["engine"] = engine
+
     G = create_graphviz(
         name=name,
+        modules=modules,
         visible_modules=visible_modules,
+        edges=edges,
         route_map=route_map,
         cluster_names=cluster_names,
         cluster_map=cluster_map,
+        cluster_parents=cluster_parents,
         render_imports=render_imports,
         summarize_external=summarize_external,
         use_clusters=use_clusters,
         use_nested_clusters=use_nested_clusters,
         comment=comment,
+        cache_dir=output_dir,
+        min_external_usages=min_external_usages,
         **kwargs,
     )
 
+    _write_cached_source(cache_path, cache_key, engine, G.source)
+
+    return _save_and_render(
+        G, cwd, output_to_project, save_dot, render, formats, parallel_render
+    )
+
+
+def _stat_pair(path: str) -> tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _read_cached_source(cache_path: str, cache_key: str) -> tuple[str, str] | None:
+    """Return the cached (dot source, engine) if the stored key matches, else None."""
+    if not os.path.exists(cache_path):
+        return None
+    with open(cache_path, "r", encoding="utf-8") as f:
+        header, _, source = f.read().partition("\n")
+    stored_key, _, engine = header.partition(" ")
+    if stored_key != cache_key:
+        return None
+    return source, engine or "dot"
+
+
+def _write_cached_source(cache_path: str, cache_key: str, engine: str, source: str):
+    with open(cache_path, "w", encoding="utf-8") as f:
+        f.write(cache_key + " " + engine + "\n" + source)
+
+
+def _save_and_render(
+    G,
+    cwd: str,
+    output_to_project: bool,
+    save_dot: bool,
+    render,
+    formats: Sequence[str] | None = None,
+    parallel_render: bool = False,
+):
+    """Restore the working directory, then save and/or render the graph."""
     if not output_to_project:
         os.chdir(cwd)
 
@@ -214,14 +377,35 @@ def dependentspy(
             )
         render = True
         if os.path.exists(G.filepath):
-            prev = open(G.filepath).read()
-            dot = G.source
-            if prev == dot:
+            # Compare digests instead of full strings; the dot file can be
+            # large and this avoids holding two copies of it in memory.
+            prev_hash = hashlib.blake2b(digest_size=16)
+            with open(G.filepath, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 16), b""):
+                    prev_hash.update(chunk)
+            new_hash = hashlib.blake2b(G.source.encode(), digest_size=16)
+            if prev_hash.digest() == new_hash.digest():
                 print("dot string has not changed, skip rendering.")
                 render = False
     if save_dot:
         G.save()
     if render:
-        G.render()
+        if formats:
+            # One renderer invocation per requested format. The renderer is an
+            # external process that releases the GIL, so threads scale.
+            G.save()
+            engine = G.engine or "dot"
+            if parallel_render and len(formats) > 1:
+                with ThreadPoolExecutor() as executor:
+                    list(
+                        executor.map(
+                            lambda fmt: gv.render(engine, fmt, G.filepath), formats
+                        )
+                    )
+            else:
+                for fmt in formats:
+                    gv.render(engine, fmt, G.filepath)
+        else:
+            G.render()
 
     return G
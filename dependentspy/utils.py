@@ -1,25 +1,72 @@
+import fnmatch
 import os
-from typing import Union
+import re
+from typing import Generator, Union
 import networkx as nx
 
 
 PathLike = Union[str, os.PathLike]  # Type hint for file paths
 
 
+def compile_ignore_patterns(ignore: list[str]) -> re.Pattern | None:
+    """Combine glob-style ignore patterns into a single compiled regex, or None if empty."""
+    if not ignore:
+        return None
+    return re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in ignore))
+
+
+def iter_py_files(root: PathLike, ignore: list[str]) -> Generator[str, None, None]:
+    """Recursively yield all .py files below `root` (as path strings relative
+    to it), skipping files that match any of the glob-style `ignore` patterns.
+
+    Built on `os.scandir` instead of `Path.rglob`, which avoids extra `stat`
+    calls and is considerably faster on large trees.
+    """
+    ignore_re = compile_ignore_patterns(ignore)
+    root = os.fspath(root)
+    prefix = len(root) + 1  # strip "<root>/" to keep paths relative
+    native_sep = os.sep != "/"  # normalize separators before matching on Windows
+    stack = [root]
+    while stack:
+        # Skip unreadable directories instead of aborting the walk, like
+        # Path.rglob does.
+        try:
+            with os.scandir(stack.pop()) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif entry.name.endswith(".py"):
+                rel_path = entry.path[prefix:]
+                if ignore_re:
+                    match_path = (
+                        rel_path.replace(os.sep, "/") if native_sep else rel_path
+                    )
+                    if ignore_re.match(match_path):
+                        continue
+                yield rel_path
+
+
 def find_dead_ends(gr: nx.DiGraph):
-    out_degrees = {v: gr.out_degree(v) for v in gr.nodes}
-    no_out = {v for v, d in out_degrees.items() if d == 0}
-    
-    C = {*no_out}
-    prev = {*C}
-    while prev:
-        new = set()
-        for u in prev:
-            for v in gr.predecessors(u):
-                if v in C:
-                    continue
-                if set(gr.successors(v)) <= C:
-                    new.add(v)
-                    C.add(v)
-        prev = new
+    """Find all nodes whose successors (transitively) all lead to dead ends.
+
+    Kahn-style reverse topological peel: track the number of successors not
+    yet known to be dead ends, peeling nodes once that counter hits zero.
+    Runs in O(V + E).
+    """
+    remaining = {v: len(s) for v, s in gr.succ.items()}
+    C = {v for v, d in remaining.items() if d == 0}
+
+    frontier = list(C)
+    while frontier:
+        u = frontier.pop()
+        for v in gr.predecessors(u):
+            if v in C:
+                continue
+            remaining[v] -= 1
+            if remaining[v] == 0:
+                C.add(v)
+                frontier.append(v)
     return C
@@ -1,8 +1,12 @@
 import hashlib
+import os
+from collections import defaultdict
+from typing import Generator
 
 import graphviz as gv
+from graphviz import quoting
 
-from dependentspy.module import Module, ProjectModule
+from dependentspy.module import Module
 
 MODULE_NODE_ATTR_COMMON = dict(
     shape="rect",
@@ -41,9 +45,10 @@ def module_color(module: Module):
     # return "#00000020"
 
 
-CLUSTER_NODE_ATTR = lambda module: dict(
+# Constant part of the cluster attributes; fillcolor is per cluster and
+# derived from module_color at the single call site.
+CLUSTER_NODE_ATTR = dict(
     style="filled",
-    fillcolor=module_color(module),
 )
 
 SUBMODULE_EDGE_ATTR = dict(
@@ -58,88 +63,258 @@ IMPORT_EDGE_ATTR = dict(
     penwidth="1",
 )
 
+# Preformatted attribute tails for the common edge cases (no lhead), so the
+# hot edge loops can append finished DOT lines instead of re-formatting the
+# same attributes for every edge.
+_IMPORT_EDGE_TAIL = quoting.attr_list(attributes=dict(type="import", **IMPORT_EDGE_ATTR))
+_SUBMODULE_EDGE_TAIL = quoting.attr_list(
+    attributes=dict(type="submodule", **SUBMODULE_EDGE_ATTR)
+)
+
+
+def _node_line_template(mtype: str) -> tuple[str, str]:
+    """Format the constant parts of a node line for the given module type.
+
+    Only the label varies between nodes of one type, so the attribute list is
+    rendered once with a placeholder label and split around it.
+    """
+    rest = quoting.attr_list(attributes=dict(type=mtype, **MODULE_NODE_ATTR[mtype]))
+    # Digraph.node emits the label first, followed by the sorted attributes:
+    # " [label=<label> fillcolor=... type=...]"
+    return " [label=", " " + rest[2:]
+
+
+_NODE_LINE_TEMPLATES = {mtype: _node_line_template(mtype) for mtype in MODULE_NODE_ATTR}
+
 
 def create_graphviz(
     name: str,
+    modules: list[Module],
     visible_modules: list[Module],
+    edges: list[tuple[int, int, bool]],
     route_map: dict[str, Module],
     cluster_names: dict[str, str],
-    cluster_map: dict[str, str | None],
+    cluster_map: list[str | None],
+    cluster_parents: dict[str, str | None],
     render_imports: bool,
     summarize_external: bool,
     use_clusters: bool,
     use_nested_clusters: bool,
+    comment: str | None = None,
+    cache_dir: str | None = None,
+    min_external_usages: int = 1,
     **kwargs,
-):
-    # Init graphviz graph
-    G = gv.Digraph(name=name, strict=True, **kwargs)
+) -> gv.Source:
+    """Generate the DOT source directly and wrap it in a `graphviz.Source`.
 
-    # Init subgraphs/clusters
-    subgraphs = {}
-    for route, cluster_name in cluster_names.items():
-        module = route_map[route]
-        H = gv.Digraph(name=cluster_name)
-        H.attr(label=module.route, **CLUSTER_NODE_ATTR(module))
-        subgraphs[module.route] = H
+    Going through the `gv.Digraph` object model formats, sorts and quotes
+    attributes per node/edge call in Python; emitting preformatted lines into
+    per-cluster buffers and joining them once is considerably faster on large
+    graphs. The returned `Source` exposes the same `save`/`render`/`view` API.
 
-    def get_containing_graph(module: Module):
-        cluster_route = cluster_map.get(module.route, None)
-        return subgraphs[cluster_route] if cluster_route else G
+    If `cache_dir` is given, a fingerprint of the structural inputs is kept
+    next to the dot file there, and an unchanged graph is reloaded from the
+    saved dot file instead of being rebuilt.
+    """
+    # graph/node/edge default-attribute statements (kwargs meant for the
+    # graph body rather than the Source constructor). Always pop the keys so
+    # they never reach the Source constructor; empty dicts emit no statement.
+    stmt_attrs = []
+    for kind in ("graph", "node", "edge"):
+        attrs = kwargs.pop(f"{kind}_attr", None)
+        if attrs:
+            stmt_attrs.append((kind, attrs))
 
-    # Add node(s) and parent-child edges
-    for module in visible_modules:
-        H = get_containing_graph(module)
-        H.node(
-            module.route,
-            type=module.type,
-            label=module.name,
-            **MODULE_NODE_ATTR[module.type],
+    fingerprint_path = None
+    if cache_dir is not None:
+        fingerprint = _fingerprint(
+            name,
+            visible_modules,
+            edges,
+            cluster_names,
+            render_imports,
+            summarize_external,
+            use_clusters,
+            use_nested_clusters,
+            comment,
+            min_external_usages,
+            stmt_attrs,
+            kwargs,
         )
-        if (
-            module.parent
-            and not use_nested_clusters
-            and module.parent in visible_modules
-            and module.parent not in subgraphs
-        ):
-            u = module.parent.route
-            v = (
-                module.route
-                if not module.route in subgraphs
-                else module.find_leaf().route
-            )
-            extra = {}
-            if module.route in subgraphs:
-                extra["lhead"] = subgraphs[module.route].name
-            H.edge(u, v, type="submodule", **SUBMODULE_EDGE_ATTR, **extra)
+        dot_path = os.path.join(cache_dir, f"{name}.gv")
+        fingerprint_path = os.path.join(cache_dir, f"{name}.gv.fp")
+        if os.path.exists(fingerprint_path) and os.path.exists(dot_path):
+            with open(fingerprint_path, "r", encoding="utf-8") as f:
+                stored_fingerprint, _, stored_digest = f.read().partition("\n")
+            # The dot file is saved later (and only with save_dot/render), so
+            # also check that it actually holds the fingerprinted source
+            # before reusing it.
+            if (
+                stored_fingerprint == fingerprint
+                and _file_digest(dot_path) == stored_digest.strip()
+            ):
+                return gv.Source.from_file(dot_path, **kwargs)
+
+    visible_mask = [False] * len(modules)
+    for module in visible_modules:
+        visible_mask[module.idx] = True
 
-    # Add subgraphs to parent graphs
-    for route, H in sorted(subgraphs.items(), key=lambda c: c[0], reverse=True):
+    # Optionally drop external modules that are imported from fewer than
+    # min_external_usages files; singleton 3rd-party leaves can balloon the
+    # output (and the layout time) without adding much structure.
+    if summarize_external and min_external_usages > 1:
+        ext_usages: dict[int, set[int]] = defaultdict(set)
+        for src, dst, dst_is_project in edges:
+            if not dst_is_project and visible_mask[src]:
+                ext_usages[modules[dst].get_root().idx].add(src)
+        for idx, sources in ext_usages.items():
+            if len(sources) < min_external_usages:
+                visible_mask[idx] = False
+        visible_modules = [m for m in visible_modules if visible_mask[m.idx]]
+
+    # Per-cluster line buffers (None = top level). Lines are stored without
+    # indentation; the assembly step below adds one tab per nesting level.
+    bodies: dict[str | None, list[str]] = defaultdict(list)
+    cluster_attrs: dict[str, str] = {}
+    cluster_children: dict[str | None, list[str]] = defaultdict(list)
+    for route, cluster_name in cluster_names.items():
         module = route_map[route]
-        H0 = get_containing_graph(module.parent) if module.parent else G
-        H0.subgraph(H)
-        # print(f"{H0.name} -> {H.name}")
+        cluster_attrs[route] = quoting.a_list(
+            kwargs=dict(
+                label=route, fillcolor=module_color(module), **CLUSTER_NODE_ATTR
+            )
+        )
+        cluster_children[cluster_parents[route]].append(route)
 
-    # print(route_map["api"], route_map["api.model"].parent)
+    # Add node(s), and parent-child edges when nesting is off. The flag is
+    # lifted out of the loop so the common nested-clusters configuration
+    # skips the parent checks entirely.
+    if use_nested_clusters:
+        for module in visible_modules:
+            head, tail = _NODE_LINE_TEMPLATES[module.type]
+            bodies[cluster_map[module.idx]].append(
+                f"{quoting.quote(module.route)}{head}"
+                f"{quoting.quote(module.name)}{tail}\n"
+            )
+    else:
+        for module in visible_modules:
+            body = bodies[cluster_map[module.idx]]
+            head, tail = _NODE_LINE_TEMPLATES[module.type]
+            body.append(
+                f"{quoting.quote(module.route)}{head}"
+                f"{quoting.quote(module.name)}{tail}\n"
+            )
+            if (
+                module.parent
+                and visible_mask[module.parent.idx]
+                and module.parent.route not in cluster_names
+            ):
+                u = quoting.quote(module.parent.route)
+                module_cluster = cluster_names.get(module.route)
+                if module_cluster:
+                    edge_tail = quoting.attr_list(
+                        attributes=dict(
+                            type="submodule",
+                            lhead=module_cluster,
+                            **SUBMODULE_EDGE_ATTR,
+                        )
+                    )
+                    v = quoting.quote(module.find_leaf().route)
+                else:
+                    edge_tail = _SUBMODULE_EDGE_TAIL
+                    v = quoting.quote(module.route)
+                body.append(f"{u} -> {v}{edge_tail}\n")
 
-    # Add import edges
+    # Add import edges (always at the top level). Edges are grouped by source
+    # module, so a per-source seen set suffices to skip duplicate targets
+    # (e.g. numpy.linalg and numpy.random both collapsing to numpy with
+    # summarize_external).
+    edge_lines: list[str] = []
     if render_imports:
-        for module in visible_modules:
-            if not isinstance(module, ProjectModule):
+        prev_src = None
+        seen: set[int] = set()
+        for src, dst, dst_is_project in edges:
+            if not visible_mask[src]:
                 continue
-            for im in module.imports:
-
-                # Fallback to root module if configured that way
-                if not im.is_project and summarize_external:
-                    im = im.get_root()
-                # Only add edge if other module is visible
-                if im not in visible_modules:
-                    continue
-                extra = {}
-                if use_clusters and im.route in subgraphs:
-                    extra["lhead"] = subgraphs[im.route].name
-                    # pass
-                G.edge(
-                    module.route, im.route, type="import", **IMPORT_EDGE_ATTR, **extra
+            if src != prev_src:
+                prev_src = src
+                seen.clear()
+            im = modules[dst]
+
+            # Fallback to root module if configured that way
+            if not dst_is_project and summarize_external:
+                im = im.get_root()
+            # Only add edge if other module is visible and not already drawn
+            if im.idx in seen or not visible_mask[im.idx]:
+                continue
+            seen.add(im.idx)
+            im_cluster = cluster_names.get(im.route) if use_clusters else None
+            if im_cluster:
+                tail = quoting.attr_list(
+                    attributes=dict(type="import", lhead=im_cluster, **IMPORT_EDGE_ATTR)
                 )
+            else:
+                tail = _IMPORT_EDGE_TAIL
+            edge_lines.append(
+                f"{quoting.quote(modules[src].route)} -> {quoting.quote(im.route)}{tail}\n"
+            )
+
+    # Assemble the source: header, top-level nodes, clusters (children
+    # emitted within their parents, post-order), then import edges. The
+    # lines are streamed straight into the final join rather than collected
+    # in another list first, so peak memory is one copy of the source plus
+    # the per-cluster buffers, not two.
+    def emit() -> Generator[str, None, None]:
+        if comment:
+            yield f"// {comment}\n"
+        yield f"strict digraph {quoting.quote(name)} {{\n"
+        for kind, attrs in stmt_attrs:
+            yield f"\t{kind}{quoting.attr_list(attributes=attrs)}\n"
+        for line in bodies[None]:
+            yield "\t" + line
+        for route in cluster_children[None]:
+            yield from emit_cluster(route, "\t")
+        for line in edge_lines:
+            yield "\t" + line
+        yield "}\n"
 
-    return G
+    def emit_cluster(route: str, indent: str) -> Generator[str, None, None]:
+        yield f"{indent}subgraph {quoting.quote(cluster_names[route])} {{\n"
+        inner = indent + "\t"
+        yield inner + cluster_attrs[route] + "\n"
+        for line in bodies[route]:
+            yield inner + line
+        for child in cluster_children[route]:
+            yield from emit_cluster(child, inner)
+        yield indent + "}\n"
+
+    source = "".join(emit())
+
+    if fingerprint_path is not None:
+        source_digest = hashlib.blake2b(source.encode(), digest_size=16).hexdigest()
+        with open(fingerprint_path, "w", encoding="utf-8") as f:
+            f.write(fingerprint + "\n" + source_digest)
+
+    return gv.Source(source, filename=f"{name}.gv", **kwargs)
+
+
+def _file_digest(path: str, digest_size: int = 16) -> str:
+    """Hash a file's contents in chunks."""
+    h = hashlib.blake2b(digest_size=digest_size)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _fingerprint(
+    name, visible_modules, edges, cluster_names, *flags, digest_size=16
+) -> str:
+    """Hash the structural inputs of create_graphviz."""
+    h = hashlib.blake2b(digest_size=digest_size)
+    h.update(repr((name, cluster_names, *flags[:-1], sorted(flags[-1].items()))).encode())
+    for module in visible_modules:
+        h.update(f"{module.route}|{module.type};".encode())
+    for src, dst, _ in edges:
+        h.update(b"%d,%d;" % (src, dst))
+    return h.hexdigest()